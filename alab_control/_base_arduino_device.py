@@ -2,19 +2,121 @@
 A base device abstraction for all the aduino devices that have RESTful API endpoints
 """
 import abc
+import functools
+import random
+import threading
 import time
-from typing import Dict, Union, Optional
+from enum import Enum
+from typing import Callable, Dict, List, Union, Optional
 
 import requests
 
 
+def cached_state(ttl: float = 0.1):
+    """
+    Cache the result of a ``get_state`` style method for ``ttl`` seconds.
+
+    Callers that arrive while a request is already in flight wait for it and share its result
+    instead of sending another request to the device. Freshly fetched states are passed to the
+    device's ``state_emitter`` after the lock is released, so that subscribers can call back into the device.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self: "BaseArduinoDevice"):
+            with self._state_lock:
+                if self._state_cache is not None and time.monotonic() - self._state_cache[0] < ttl:
+                    return self._state_cache[1]
+                state = func(self)
+                self._state_cache = (time.monotonic(), state)
+            self.state_emitter.observe(state)
+            return state
+
+        return wrapper
+
+    return decorator
+
+
+class StateChangeEmitter:
+    """
+    Forward the states observed while polling a device to subscribers, but only when the state changes.
+
+    A change observed within ``min_interval_s`` of the last emission is held back, so that a state flipping
+    back and forth reaches the subscribers as a single transition. The held back state is emitted on the next
+    observation after the interval, or by ``flush``.
+    """
+
+    def __init__(self, min_interval_s: float = 0.5):
+        self.min_interval_s = min_interval_s
+        self.last_emitted_state: Optional[Enum] = None
+        self._last_emitted_at = float("-inf")
+        self._pending_state: Optional[Enum] = None
+        self._callbacks: List[Callable[[Enum], None]] = []
+
+    def subscribe(self, callback: Callable[[Enum], None]):
+        """
+        Call ``callback(new_state)`` on every state change
+        """
+        self._callbacks.append(callback)
+
+    def unsubscribe(self, callback: Callable[[Enum], None]):
+        self._callbacks.remove(callback)
+
+    def observe(self, state: Enum):
+        """
+        Report a freshly polled state
+        """
+        if state == self.last_emitted_state:
+            self._pending_state = None  # a change that reverted before it was emitted
+            return
+        if time.monotonic() - self._last_emitted_at < self.min_interval_s:
+            self._pending_state = state
+            return
+        self._emit(state)
+
+    def flush(self):
+        """
+        Emit the held back state, if any. Call this when polling stops.
+        """
+        if self._pending_state is not None:
+            self._emit(self._pending_state)
+
+    def _emit(self, state: Enum):
+        self.last_emitted_state = state
+        self._last_emitted_at = time.monotonic()
+        self._pending_state = None
+        for callback in list(self._callbacks):
+            callback(state)
+
+
 class BaseArduinoDevice(abc.ABC):
+    WAIT_ENDPOINT = "/wait_done"  # long-poll endpoint, answered by the firmware once the device leaves the running state
+
     def __init__(self, ip_address: str, port: int = 80):
         self.ip_address = ip_address
         self.port = port
+        self._state_lock = threading.Lock()
+        self._state_cache = None
+        self._long_poll_supported = True
+        self.state_emitter = StateChangeEmitter()  # subscribe here to be told about state changes instead of polling
+
+    def invalidate_state_cache(self):
+        """
+        Drop the cached state, so that the next state query goes to the device. Call this
+        after sending any command that changes the state of the device.
+        """
+        self._state_cache = None
 
     def send_request(self, endpoint: str, data: Optional[Dict[str, Union[str, int, float, bytes, bool]]] = None,
-                     method: str = "GET", jsonify: bool = True, suppress_error: bool = False, timeout=600, max_retries=1):
+                     method: str = "GET", jsonify: bool = True, suppress_error: bool = False, timeout=600, max_retries=1,
+                     backoff_base: float = 0.1, backoff_cap: float = 2.0):
+        """
+        Send a request to the device, retrying up to ``max_retries`` times.
+
+        Between retries we sleep for a random time in ``[0.05, min(backoff_cap, backoff_base * 2 ** retries)]``
+        seconds, so that several clients retrying against the (single-threaded) Arduino server do not
+        hit it at the same moment again.
+        """
         url = f"http://{self.ip_address}:{self.port}{endpoint}"
         time.sleep(0.1)
         retries = 0
@@ -22,12 +124,58 @@ class BaseArduinoDevice(abc.ABC):
             try:
                 response = requests.request(method=method, url=url, data=data, timeout=timeout)
                 break
-            except:
+            except requests.exceptions.RequestException:
                 retries += 1
                 if retries >= max_retries:
                     raise RuntimeError(f"Failed to send request to {url}")
+                time.sleep(random.uniform(0.05, max(0.05, min(backoff_cap, backoff_base * 2 ** retries))))
         if not suppress_error:
             response.raise_for_status()
         if jsonify:
             return response.json()
         return response
+
+    def wait_for_state(self, target_state: Enum, timeout: float) -> bool:
+        """
+        Block until the device reports ``target_state`` or ``timeout`` seconds have passed.
+
+        If the firmware provides the ``WAIT_ENDPOINT`` long-poll endpoint, a single request is held open by
+        the device until its state changes. Otherwise (the firmware answers 404, or the long-poll request fails),
+        we fall back to polling ``get_state``, which the subclass must implement, with an exponential backoff.
+
+        Args:
+            target_state: the state to wait for, a member of the enum returned by ``get_state``
+            timeout: the maximum time (seconds) to wait
+
+        Returns:
+            True if the device reached ``target_state``, False if we timed out
+        """
+        deadline = time.time() + timeout
+        if self._long_poll_supported:
+            try:
+                response = self.send_request(
+                    f"{self.WAIT_ENDPOINT}?timeout={max(int(timeout), 1)}",
+                    method="GET",
+                    jsonify=False,
+                    suppress_error=True,
+                    timeout=timeout + 5,
+                    max_retries=5,
+                    backoff_cap=1.0,
+                )
+            except RuntimeError:
+                response = None  # could not reach the device this time, poll instead
+            if response is not None and response.status_code == 404:
+                self._long_poll_supported = False  # not supported by this firmware, don't ask again
+            elif response is not None and response.ok:
+                self.invalidate_state_cache()
+                state = type(target_state)[response.json()["state"].upper()]
+                self.state_emitter.observe(state)
+                return state == target_state
+
+        interval = 0.1
+        while self.get_state() != target_state:
+            if time.time() > deadline:
+                return False
+            time.sleep(interval)
+            interval = min(interval * 1.5, 2.0)
+        return True
@@ -0,0 +1,120 @@
+"""
+An asyncio version of the base device for the arduino devices that have RESTful API endpoints. Waiting on
+several devices can then overlap on a single thread, e.g.
+
+    await asyncio.gather(*[dispenser.dispense_balls() for dispenser in dispensers])
+"""
+import abc
+import asyncio
+import json
+import random
+import time
+from enum import Enum
+from typing import TYPE_CHECKING, Dict, Union, Optional
+
+from alab_control._base_arduino_device import StateChangeEmitter
+
+if TYPE_CHECKING:
+    import aiohttp
+
+
+class AsyncBaseArduinoDevice(abc.ABC):
+    WAIT_ENDPOINT = "/wait_done"  # long-poll endpoint, answered by the firmware once the device leaves the running state
+
+    def __init__(self, ip_address: str, port: int = 80):
+        self.ip_address = ip_address
+        self.port = port
+        self._session: Optional["aiohttp.ClientSession"] = None
+        self._long_poll_supported = True
+        self.state_emitter = StateChangeEmitter()  # subscribe here to be told about state changes instead of polling
+
+    async def close_session(self):
+        """
+        Close the HTTP session of this device
+        """
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        await self.close_session()
+
+    async def send_request(self, endpoint: str, data: Optional[Dict[str, Union[str, int, float, bytes, bool]]] = None,
+                           method: str = "GET", jsonify: bool = True, suppress_error: bool = False, timeout=600,
+                           max_retries=1, backoff_base: float = 0.1, backoff_cap: float = 2.0):
+        """
+        Send a request to the device, retrying up to ``max_retries`` times with a random exponential backoff.
+        See :meth:`BaseArduinoDevice.send_request`.
+        """
+        # imported here rather than at module level, so that the synchronous drivers exported next to the async ones do not need aiohttp (installed with the `async` extra)
+        import aiohttp
+
+        url = f"http://{self.ip_address}:{self.port}{endpoint}"
+        if self._session is None:
+            # created lazily, as the session is bound to the running event loop
+            self._session = aiohttp.ClientSession()
+        await asyncio.sleep(0.1)
+        retries = 0
+        while retries < max_retries:
+            try:
+                async with self._session.request(
+                    method=method, url=url, data=data, timeout=aiohttp.ClientTimeout(total=timeout)
+                ) as response:
+                    body = await response.read()
+                break
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                retries += 1
+                if retries >= max_retries:
+                    raise RuntimeError(f"Failed to send request to {url}")
+                await asyncio.sleep(random.uniform(0.05, max(0.05, min(backoff_cap, backoff_base * 2 ** retries))))
+        if not suppress_error:
+            response.raise_for_status()
+        if jsonify:
+            return json.loads(body)
+        return response
+
+    @abc.abstractmethod
+    async def get_state(self) -> Enum:
+        """
+        Get the current state of the device
+        """
+
+    async def wait_for_state(self, target_state: Enum, timeout: float) -> bool:
+        """
+        Wait until the device reports ``target_state`` or ``timeout`` seconds have passed.
+        See :meth:`BaseArduinoDevice.wait_for_state`.
+
+        Returns:
+            True if the device reached ``target_state``, False if we timed out
+        """
+        deadline = time.time() + timeout
+        if self._long_poll_supported:
+            try:
+                response = await self.send_request(
+                    f"{self.WAIT_ENDPOINT}?timeout={max(int(timeout), 1)}",
+                    method="GET",
+                    jsonify=False,
+                    suppress_error=True,
+                    timeout=timeout + 5,
+                    max_retries=5,
+                    backoff_cap=1.0,
+                )
+            except RuntimeError:
+                response = None  # could not reach the device this time, poll instead
+            if response is not None and response.status == 404:
+                self._long_poll_supported = False  # not supported by this firmware, don't ask again
+            elif response is not None and response.ok:
+                state = type(target_state)[(await response.json(content_type=None))["state"].upper()]
+                self.state_emitter.observe(state)
+                return state == target_state
+
+        interval = 0.1
+        while await self.get_state() != target_state:
+            if time.time() > deadline:
+                return False
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, 2.0)
+        return True
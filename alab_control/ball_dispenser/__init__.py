@@ -1 +1 @@
-from .ball_dispenser import BallDispenser, BallDispenserState, EmptyError
+from .ball_dispenser import AsyncBallDispenser, BallDispenser, BallDispenserState, EmptyError
@@ -1,7 +1,9 @@
+import asyncio
 import time
 from enum import Enum
 
-from alab_control._base_arduino_device import BaseArduinoDevice
+from alab_control._base_arduino_device import BaseArduinoDevice, cached_state
+from alab_control._base_arduino_device_async import AsyncBaseArduinoDevice
 
 
 class BallDispenserState(Enum):
@@ -36,15 +38,23 @@ class BallDispenser(BaseArduinoDevice):
             raise RuntimeError("Dispenser is still running")
 
         self.send_request(self.ENDPOINTS["start"], method="GET", timeout=1, max_retries=5)
+        self.invalidate_state_cache()
         start_time = time.time()
-        time.sleep(5)
+
+        # wait (at most 5 s) for the dispenser to report that it is running
+        deadline = start_time + 5
+        while self.get_state() != BallDispenserState.RUNNING and time.time() < deadline:
+            time.sleep(0.05)
 
         # wait until finishes
-        while self.get_state() == BallDispenserState.RUNNING:
-            time.sleep(0.2)
-            if time.time() - start_time > self.EMPTY_TIMEOUT:
-                self.stop()
-                raise EmptyError("Dispenser is empty")
+        finished = self.wait_for_state(
+            BallDispenserState.STOPPED, timeout=self.EMPTY_TIMEOUT - (time.time() - start_time)
+        )
+        if not finished:
+            self.stop()
+        self.state_emitter.flush()  # after stopping, so that subscribers hear about the final state
+        if not finished:
+            raise EmptyError("Dispenser is empty")
 
     def stop(self):
         """
@@ -52,7 +62,9 @@ class BallDispenser(BaseArduinoDevice):
         """
         if self.get_state() == BallDispenserState.STOPPED:
             return
-        self.send_request(self.ENDPOINTS["stop"], method="GET", timeout=1, max_retries=5)
+        self.send_request(self.ENDPOINTS["stop"], method="GET", timeout=1, max_retries=5, backoff_cap=1.0)
+        self.invalidate_state_cache()
+        self.state_emitter.observe(BallDispenserState.STOPPED)
 
     def change_number(self, n: int):
         """
@@ -65,10 +77,78 @@ class BallDispenser(BaseArduinoDevice):
             raise ValueError("n must be between 0 and 100")
         self.send_request(self.ENDPOINTS["change_number"], data={"n": n}, method="GET")
 
+    @cached_state(ttl=0.1)
     def get_state(self) -> BallDispenserState:
         """
         Get the current state of the dispenser
         """
         return BallDispenserState[
-            self.send_request(self.ENDPOINTS["state"], method="GET", max_retries=5, timeout=10)["state"].upper()
+            self.send_request(
+                self.ENDPOINTS["state"], method="GET", max_retries=5, timeout=10, backoff_cap=1.0
+            )["state"].upper()
         ]
+
+
+class AsyncBallDispenser(AsyncBaseArduinoDevice):
+    """
+    asyncio version of :class:`BallDispenser`, to dispense balls from several dispensers concurrently.
+    """
+
+    EMPTY_TIMEOUT = BallDispenser.EMPTY_TIMEOUT
+    ENDPOINTS = BallDispenser.ENDPOINTS
+
+    async def dispense_balls(self):
+        """
+        Dispense balls
+        """
+        if await self.get_state() == BallDispenserState.RUNNING:
+            raise RuntimeError("Dispenser is still running")
+
+        await self.send_request(self.ENDPOINTS["start"], method="GET", timeout=1, max_retries=5)
+        start_time = time.time()
+
+        # wait (at most 5 s) for the dispenser to report that it is running
+        deadline = start_time + 5
+        while await self.get_state() != BallDispenserState.RUNNING and time.time() < deadline:
+            await asyncio.sleep(0.05)
+
+        # wait until finishes
+        finished = await self.wait_for_state(
+            BallDispenserState.STOPPED, timeout=self.EMPTY_TIMEOUT - (time.time() - start_time)
+        )
+        if not finished:
+            await self.stop()
+        self.state_emitter.flush()  # after stopping, so that subscribers hear about the final state
+        if not finished:
+            raise EmptyError("Dispenser is empty")
+
+    async def stop(self):
+        """
+        Stop the dispenser
+        """
+        if await self.get_state() == BallDispenserState.STOPPED:
+            return
+        await self.send_request(self.ENDPOINTS["stop"], method="GET", timeout=1, max_retries=5, backoff_cap=1.0)
+        self.state_emitter.observe(BallDispenserState.STOPPED)
+
+    async def change_number(self, n: int):
+        """
+        Change the number of balls to dispense
+
+        Args:
+            n: number of balls to dispense
+        """
+        if not 0 <= n <= 100:
+            raise ValueError("n must be between 0 and 100")
+        await self.send_request(self.ENDPOINTS["change_number"], data={"n": n}, method="GET")
+
+    async def get_state(self) -> BallDispenserState:
+        """
+        Get the current state of the dispenser
+        """
+        response = await self.send_request(
+            self.ENDPOINTS["state"], method="GET", max_retries=5, timeout=10, backoff_cap=1.0
+        )
+        state = BallDispenserState[response["state"].upper()]
+        self.state_emitter.observe(state)
+        return state
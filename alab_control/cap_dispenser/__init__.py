@@ -1 +1 @@
-from .cap_dispenser import CapDispenser, CapDispenserState
+from .cap_dispenser import AsyncCapDispenser, CapDispenser, CapDispenserState
@@ -1,7 +1,9 @@
+import asyncio
 import time
 from enum import Enum
 
-from alab_control._base_arduino_device import BaseArduinoDevice
+from alab_control._base_arduino_device import BaseArduinoDevice, cached_state
+from alab_control._base_arduino_device_async import AsyncBaseArduinoDevice
 
 
 class CapDispenserState(Enum):
@@ -30,7 +32,22 @@ class CapDispenser(BaseArduinoDevice):
     def __init__(self, ip_address: str, port: int = 80):
         super().__init__(ip_address, port)
         self.names=["A","B","C","D"]
+        self._open_mask = 0  # bit MAP[name]-1 is set while dispenser `name` is open (as commanded by this instance)
 
+    def is_open(self, name: str) -> bool:
+        """
+        Whether the cap dispenser `name` was opened (and not closed again) through this instance
+        """
+        return bool(self._open_mask & (1 << (self.MAP[name] - 1)))
+
+    @property
+    def num_open(self) -> int:
+        """
+        Number of cap dispensers that are currently open
+        """
+        return bin(self._open_mask).count("1")
+
+    @cached_state(ttl=0.1)
     def get_state(self) -> CapDispenserState:
         """
         Get the current state of the cap dispenser
@@ -48,9 +65,13 @@ class CapDispenser(BaseArduinoDevice):
             raise RuntimeError("Cannot open the cap dispenser while it is running")
         print("Opening a cap dispenser")
         self.send_request(self.ENDPOINTS[f"open n={self.MAP[name]}"], method="GET", suppress_error=True, max_retries=10, timeout=1)
-        time.sleep(0.2)
+        self.invalidate_state_cache()
+        interval = 0.1
         while self.get_state() == CapDispenserState.RUNNING:
-            time.sleep(0.2)
+            time.sleep(interval)
+            interval = min(interval * 1.5, 2.0)
+        self.state_emitter.flush()
+        self._open_mask |= 1 << (self.MAP[name] - 1)
 
     def close(self, name: str):
         """
@@ -62,6 +83,68 @@ class CapDispenser(BaseArduinoDevice):
             raise RuntimeError("Cannot open the cap dispenser while it is running")
         print("Closing a cap dispenser")
         self.send_request(self.ENDPOINTS[f"close n={self.MAP[name]}"], method="GET", suppress_error=True, max_retries=10, timeout=1)
-        time.sleep(0.2)
+        self.invalidate_state_cache()
+        interval = 0.1
         while self.get_state() == CapDispenserState.RUNNING:
-            time.sleep(0.2)
+            time.sleep(interval)
+            interval = min(interval * 1.5, 2.0)
+        self.state_emitter.flush()
+        self._open_mask &= ~(1 << (self.MAP[name] - 1))
+
+
+class AsyncCapDispenser(AsyncBaseArduinoDevice):
+    """
+    asyncio version of :class:`CapDispenser`, to operate several cap dispensers concurrently.
+    """
+
+    MAP = CapDispenser.MAP
+    ENDPOINTS = CapDispenser.ENDPOINTS
+
+    def __init__(self, ip_address: str, port: int = 80):
+        super().__init__(ip_address, port)
+        self.names = ["A", "B", "C", "D"]
+        self._open_mask = 0  # bit MAP[name]-1 is set while dispenser `name` is open (as commanded by this instance)
+
+    # the open state bookkeeping is the same as in the synchronous driver
+    is_open = CapDispenser.is_open
+    num_open = CapDispenser.num_open
+
+    async def get_state(self) -> CapDispenserState:
+        """
+        Get the current state of the cap dispenser
+        whether it is running or not.
+        """
+        response = await self.send_request(
+            self.ENDPOINTS["state"], method="GET", suppress_error=True, max_retries=10, timeout=1
+        )
+        state = CapDispenserState[response["state"].upper()]
+        self.state_emitter.observe(state)
+        return state
+
+    async def _run(self, command: str, name: str):
+        if name not in self.names:
+            raise ValueError("name must be one of the specified names in the initialization" + str(self.names))
+        if await self.get_state() == CapDispenserState.RUNNING:
+            raise RuntimeError(f"Cannot {command} the cap dispenser while it is running")
+        await self.send_request(
+            self.ENDPOINTS[f"{command} n={self.MAP[name]}"], method="GET", suppress_error=True, max_retries=10, timeout=1
+        )
+        interval = 0.1
+        while await self.get_state() == CapDispenserState.RUNNING:
+            await asyncio.sleep(interval)
+            interval = min(interval * 1.5, 2.0)
+        self.state_emitter.flush()
+
+    async def open(self, name: str):
+        """
+        Open the cap dispenser
+        """
+        await self._run("open", name)
+        self._open_mask |= 1 << (self.MAP[name] - 1)
+
+    async def close(self, name: str):
+        """
+        Close the cap dispenser
+        """
+        await self._run("close", name)
+        self._open_mask &= ~(1 << (self.MAP[name] - 1))
@@ -1,38 +1,103 @@
-import requests
-from typing import Dict, List, Literal, Union
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import gzip
+import orjson
+from typing import TYPE_CHECKING, Dict, List, Literal, Optional, Union
 from ..error import LabmanError, LabmanCommunicationError
 from .enums import WorkflowValidationResult
 
+if TYPE_CHECKING:
+    import requests
+
 VALID_QUADRANTS = [1, 2, 3, 4]
 VALID_DOSING_HEADS = [i + 1 for i in range(24)]
 
 
+def _json_default(obj):
+    """Encode the float subclasses (e.g. from user code) that orjson rejects but the stdlib json encoder accepted"""
+    if isinstance(obj, float):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
 class LabmanAPI:
     REQUESTS_KWARGS = {
         "timeout": 5,
     }  # keyword arguments to pass to requests.get and requests.post
+    GZIP_MIN_BYTES: Optional[int] = None  # gzip json request bodies of at least this many bytes. Off by default, as the Labman server must accept `Content-Encoding: gzip` requests.
 
     def __init__(self, url: str, port: int):
         self.API_BASE = f"{url}:{port}"
         if not self.API_BASE.startswith("http"):
             self.API_BASE = "http://" + self.API_BASE
 
+        # endpoint urls, built once rather than on every call
+        self._url_status = f"{self.API_BASE}/GetStatus"
+        self._url_results = f"{self.API_BASE}/GetResults"
+        self._url_request_rack = f"{self.API_BASE}/RequestIndexingRackControl"
+        self._url_release_rack = f"{self.API_BASE}/ReleaseIndexingRackControl"
+        self._url_pots_loaded = f"{self.API_BASE}/PotsLoaded"
+        self._url_pots_unloaded = f"{self.API_BASE}/PotsUnloaded"
+        self._url_validate_workflow = f"{self.API_BASE}/ValidateWorkflow"
+        self._url_dosinghead_loaded = f"{self.API_BASE}/DosingHeadLoaded"
+        self._url_dosinghead_unloaded = f"{self.API_BASE}/DosingHeadUnloaded"
+        self._url_dosingheads = f"{self.API_BASE}/DosingHeads"
+
+        # imported here rather than at module level, so that importing alab_control.labman stays cheap for code that never talks to the Labman
+        import requests
+        from requests.adapters import HTTPAdapter
+        from urllib3.util.retry import Retry
+
+        # reuse connections to the Labman server (HTTP keep-alive) instead of reconnecting on every call
+        self._session = requests.Session()
+        self._session.mount(
+            self.API_BASE,
+            HTTPAdapter(
+                pool_connections=4,
+                pool_maxsize=16,
+                max_retries=Retry(total=3, backoff_factor=0.2),
+            ),
+        )
+
+    def close(self):
+        """Close the connections held open to the Labman server"""
+        self._session.close()
+
+    def __del__(self):
+        session = getattr(self, "_session", None)
+        if session is not None:
+            session.close()
+
     ### Under the hood
     def _get(self, url: str, **kwargs):
-        mixed_kwargs = self.REQUESTS_KWARGS
-        mixed_kwargs.update(kwargs)
+        mixed_kwargs = {**self.REQUESTS_KWARGS, **kwargs}
 
-        response = requests.get(url=url, **mixed_kwargs)
+        response = self._session.get(url=url, **mixed_kwargs)
         return self._process_labman_response(response)
 
-    def _post(self, url: str, **kwargs):
-        mixed_kwargs = self.REQUESTS_KWARGS
-        mixed_kwargs.update(kwargs)
+    def _post(
+        self, url: str, json: Optional[Union[dict, list, bytes]] = None, **kwargs
+    ):
+        mixed_kwargs = {**self.REQUESTS_KWARGS, **kwargs}
+        if json is not None:
+            # orjson is much faster than the stdlib encoder requests would use for large workflows. Payloads that are already encoded (bytes) are sent as they are.
+            body = (
+                json
+                if isinstance(json, bytes)
+                else orjson.dumps(
+                    json, option=orjson.OPT_SERIALIZE_NUMPY, default=_json_default
+                )
+            )
+            headers = {"Content-Type": "application/json"}
+            if self.GZIP_MIN_BYTES is not None and len(body) >= self.GZIP_MIN_BYTES:
+                body = gzip.compress(body)
+                headers["Content-Encoding"] = "gzip"
+            mixed_kwargs["data"] = body
+            mixed_kwargs["headers"] = {**headers, **mixed_kwargs.get("headers", {})}
 
-        response = requests.post(url=url, **mixed_kwargs)
+        response = self._session.post(url=url, **mixed_kwargs)
         return self._process_labman_response(response)
 
-    def _process_labman_response(self, response: requests.Response) -> dict:
+    def _process_labman_response(self, response: "requests.Response") -> dict:
         """Checks server response for errors, returns any json data returned from server
 
         Args:
@@ -79,63 +144,107 @@ class LabmanAPI:
                     {'LoadedWorkflowName': None, 'Progress': 'Empty', 'QuadrantNumber': 4}],
                     'RobotRunning': True}}
         """
-        url = f"{self.API_BASE}/GetStatus"
-        return self._get(url)
+        return self._get(self._url_status)
 
     def get_results(self, workflow_name: str):
-        url = f"{self.API_BASE}/GetResults"
-        return self._get(url=url, params={"workflowName": workflow_name})
+        return self._get(
+            url=self._url_results, params={"workflowName": workflow_name}
+        )
 
     def request_indexing_rack_control(self, index: Literal[1, 2, 3, 4]):
         if index not in [1, 2, 3, 4]:
             raise ValueError(
                 f"Indexing rack control can only be requested for quadrants 1-4! You asked for quadrant {index}"
             )
-        url = (
-            f"{self.API_BASE}/RequestIndexingRackControl?outwardFacingQuadrant={index}"
+        return self._post(
+            url=self._url_request_rack, params={"outwardFacingQuadrant": index}
         )
-        return self._post(url=url)
 
     def release_indexing_rack_control(self):
-        url = f"{self.API_BASE}/ReleaseIndexingRackControl"
-        return self._post(url)
+        return self._post(self._url_release_rack)
+
+    def submit_workflow(self, workflow_json: Union[dict, bytes]):
+        """Submit a workflow to the Labman.
 
-    def submit_workflow(self, workflow_json: dict):
-        url = f"{self.API_BASE}/PotsLoaded"
-        return self._post(url, json=workflow_json)
+        Args:
+            workflow_json (Union[dict, bytes]): workflow payload, either as returned by `Workflow.to_json` or already encoded by `Workflow.to_json_bytes`
+        """
+        return self._post(self._url_pots_loaded, json=workflow_json)
+
+    def pool_submit(
+        self, workflows: List[Union[dict, bytes]], max_workers: int = 4
+    ) -> List[Union[WorkflowValidationResult, Exception]]:
+        """Validate and submit several workflows concurrently. Each workflow is validated, and submitted only if it is valid. The requests for different workflows overlap, sharing this instance's connection pool. A failure for one workflow does not stop the others.
+
+        Args:
+            workflows (List[Union[dict, bytes]]): workflow payloads, as passed to `submit_workflow`
+            max_workers (int, optional): maximum number of workflows in flight at once. Defaults to 4 (one per quadrant).
+
+        Returns:
+            List[Union[WorkflowValidationResult, Exception]]: for each workflow, in the order given, either its validation result or the exception raised while validating or submitting it. Only workflows with `WorkflowValidationResult.NoError` were submitted.
+        """
+
+        def validate_and_submit(
+            workflow_json: Union[dict, bytes]
+        ) -> WorkflowValidationResult:
+            if isinstance(workflow_json, bytes):
+                inputfiles = orjson.loads(workflow_json)["InputFile"]
+            else:
+                inputfiles = workflow_json["InputFile"]
+            result = self.validate_workflow(inputfiles)
+            if result == WorkflowValidationResult.NoError:
+                self.submit_workflow(workflow_json)
+            return result
+
+        results: List[Union[WorkflowValidationResult, Exception]] = [None] * len(
+            workflows
+        )
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(validate_and_submit, workflow_json): idx
+                for idx, workflow_json in enumerate(workflows)
+            }
+            for future in as_completed(futures):
+                idx = futures[future]
+                try:
+                    results[idx] = future.result()
+                except Exception as e:
+                    results[idx] = e
+        return results
 
     def pots_unloaded(self, index: Literal[1, 2, 3, 4]):
         if index not in [1, 2, 3, 4]:
             raise ValueError(
                 f"You tried to unload invalid quadrant index {index}. Valid values are: {VALID_QUADRANTS}"
             )
-        url = f"{self.API_BASE}/PotsUnloaded?quadrant={index}"
-        return self._post(url)
+        return self._post(self._url_pots_unloaded, params={"quadrant": index})
 
-    def validate_workflow(self, workflow_json: dict) -> WorkflowValidationResult:
-        url = f"{self.API_BASE}/ValidateWorkflow"
-        result = self._post(url, json=workflow_json)
+    def validate_workflow(
+        self, workflow_json: Union[dict, list, bytes]
+    ) -> WorkflowValidationResult:
+        result = self._post(self._url_validate_workflow, json=workflow_json)
         return WorkflowValidationResult(result["Result"])
 
     def load_powder(self, index: int, powder_name: str):
         # return
-        url = f"{self.API_BASE}/DosingHeadLoaded"
         if index not in VALID_DOSING_HEADS:
             raise ValueError(
                 f"Invalid dosing head index {index}. Valid values are: {VALID_DOSING_HEADS}"
             )
 
-        return self._post(url, json={"Position": index, "PowderName": powder_name})
+        return self._post(
+            self._url_dosinghead_loaded,
+            json={"Position": index, "PowderName": powder_name},
+        )
 
     def unload_powder(self, index: int):
         # return
-        url = f"{self.API_BASE}/DosingHeadUnloaded?position={index}"
         if index not in VALID_DOSING_HEADS:
             raise ValueError(
                 f"Invalid dosing head index {index}. Valid values are: {VALID_DOSING_HEADS}"
             )
 
-        return self._post(url)
+        return self._post(self._url_dosinghead_unloaded, params={"position": index})
 
     def get_dosingheads(self) -> List[Dict[str, Union[bool, int, str]]]:
         """Example response:
@@ -173,5 +282,4 @@ class LabmanAPI:
         Returns:
             List[Dict[str, Union[bool, int, str]]]: See example above in docstring
         """
-        url = f"{self.API_BASE}/DosingHeads"
-        return self._get(url)
+        return self._get(self._url_dosingheads)
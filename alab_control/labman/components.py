@@ -1,11 +1,48 @@
+"""
+The building blocks of a Labman workflow: InputFiles (the recipe for one mixing pot) and Workflows (a batch of InputFiles for one quadrant).
+
+A note on performance: building and serializing a workflow is dominated by small dicts, strings and JSON, not by numerical loops, so JIT compilers like Numba or Cython would not help here. The costs that matter are handled by caching the serialized form of each InputFile (`_get_labman_base`, `_write_labman_json`), comparing InputFiles by a cached signature (`_get_signature`) that `Workflow` also uses to find merge targets, and encoding with orjson (`Workflow.to_json_bytes`). Please keep these caches consistent when changing the attributes they depend on.
+"""
+import bisect
+from collections import defaultdict
 import math
-from typing import Any, Dict, Optional, Type, List
-from molmass import Formula
-from bson import ObjectId
+import sys
+import time
+from typing import Any, Dict, FrozenSet, Iterable, Optional, Tuple, Type, List
 from datetime import datetime
+import orjson
 from alab_control.labman.error import WorkflowFullError
 from enum import Enum, auto
 
+_HEATING_S_PER_UL = 90 * 60 / 10000  # 90 minutes per 10 mL of ethanol as a conservative guess
+_ETHANOL_G_PER_UL = 0.789 / 1000  # 0.789 g/cm^3 = 0.789 g/mL = 0.789 g/1000 uL
+_MIN_TRANSFER_FUDGE = 0.85  # fraction of the slurry mass we expect to collect, see `InputFile.__init__`
+
+
+def _dumps(obj: Any) -> bytes:
+    """orjson.dumps, also accepting the numpy scalars and float subclasses that users pass in as masses and volumes (as the stdlib json encoder did)"""
+    return orjson.dumps(obj, option=orjson.OPT_SERIALIZE_NUMPY, default=_float_default)
+
+
+def _float_default(obj):
+    if isinstance(obj, float):
+        return float(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def _recipe_property(name: str, doc: str) -> property:
+    """An InputFile attribute that the cached serialization, signature and jar capacity depend on. Setting it drops those caches."""
+    attr = "_" + name
+
+    def fget(self):
+        return getattr(self, attr)
+
+    def fset(self, value):
+        setattr(self, attr, value)
+        self._drop_recipe_caches()
+
+    return property(fget, fset, doc=doc)
+
 
 class InputFile:
     MAX_JAR_VOLUME_UL = 22000  # 22 mL
@@ -42,7 +79,7 @@ class InputFile:
         if len(powder_dispenses) == 0:
             raise ValueError("`powder_dispenses` must be non-empty!")
 
-        if any([mass <= 0 for powder, mass in powder_dispenses.items()]):
+        if any(mass <= 0 for mass in powder_dispenses.values()):
             raise ValueError(
                 "Invalid mass provided in `powder_dispenses`. All masses must be >= 0 grams!"
             )
@@ -55,9 +92,9 @@ class InputFile:
         self.ethanol_volume = ethanol_volume_ul
         self.transfer_volume = transfer_volume_ul or self.ethanol_volume
 
-        heating_duration_s = heating_duration_s or self.ethanol_volume * (
-            90 * 60 / 10000
-        )  # 90 minutes per 10 mL of ethanol as a conservative guess
+        heating_duration_s = (
+            heating_duration_s or self.ethanol_volume * _HEATING_S_PER_UL
+        )
         if heating_duration_s < 0 or heating_duration_s > 240 * 60:
             raise ValueError(
                 "`heating_duration_s` must be between 0 and 14400 seconds (0 and 240 minutes)! "
@@ -81,14 +118,10 @@ class InputFile:
 
             Finally, we know that the mass of the slurry is shared between the etOH and the powders, so the above sum is an overestimate. We probably won't collect all the powder either. So we multiply the total mass by 0.85 to account for this. This factor is totally a guess tbh!
             """
-            ethanol_g_per_ul = (
-                0.789 / 1000
-            )  # 0.789 g/cm^3 = 0.789 g/mL = 0.789 g/1000 uL
-
-            self.min_transfer_mass = self.transfer_volume * ethanol_g_per_ul
-            for powder, mass in powder_dispenses.items():
-                self.min_transfer_mass += mass
-            self.min_transfer_mass *= 0.85
+            self.min_transfer_mass = (
+                self.transfer_volume * _ETHANOL_G_PER_UL
+                + math.fsum(powder_dispenses.values())
+            ) * _MIN_TRANSFER_FUDGE
 
         self.allow_replicates = allow_replicates
         if not allow_replicates and replicates > 1:
@@ -101,21 +134,121 @@ class InputFile:
         else:
             self.time_added = time_added
 
+    # The serialized form, signature and jar capacity of an InputFile are cached. Every attribute they depend on is a property that drops the caches when it is reassigned. Replace `powder_dispenses` rather than modifying it in place!
+
+    heating_duration = _recipe_property(
+        "heating_duration", "Duration (seconds) to heat the crucible"
+    )
+    ethanol_volume = _recipe_property(
+        "ethanol_volume", "Volume (microliters) of ethanol per replicate"
+    )
+    transfer_volume = _recipe_property(
+        "transfer_volume",
+        "Volume (microliters) to transfer from the mixing pot to the crucible",
+    )
+    mixer_speed = _recipe_property("mixer_speed", "Mixer speed (rpm)")
+    mixer_duration = _recipe_property("mixer_duration", "Mixer duration (seconds)")
+    min_transfer_mass = _recipe_property(
+        "min_transfer_mass",
+        "Minimum mass (g) to transfer from the mixing pot to the crucible",
+    )
+
+    def _drop_recipe_caches(self):
+        self._labman_base = None
+        self._labman_json_prefix = None
+        self._signature = None
+        self._max_replicates = None
+
+    @property
+    def replicates(self) -> int:
+        """Number of crucibles to prepare from this InputFile"""
+        return self._replicates
+
+    @replicates.setter
+    def replicates(self, value: int):
+        self._replicates = value
+        self._labman_base = None
+        self._labman_json_prefix = None
+        self._scaled_powders = None
+
+    @property
+    def powder_dispenses(self) -> Dict[str, float]:
+        """Powders and masses (per replicate) to mix into the crucible"""
+        return self._powder_dispenses
+
+    @powder_dispenses.setter
+    def powder_dispenses(self, value: Dict[str, float]):
+        self._powder_dispenses = value
+        self._scaled_powders = None
+        self._drop_recipe_caches()
+
+    @property
+    def time_added(self) -> datetime:
+        """Time at which this InputFile was created"""
+        return self._time_added
+
+    @time_added.setter
+    def time_added(self, value: datetime):
+        self._time_added = value
+        self._time_added_epoch = value.timestamp()
+        self._time_added_iso = value.isoformat()
+
+    def _get_signature(self) -> tuple:
+        """The per-replicate recipe of this InputFile, used for equality and hashing. It does not depend on the number of replicates or the time added."""
+        if self._signature is None:
+            self._signature = (
+                int(self.heating_duration),
+                int(self.ethanol_volume),
+                round(self.min_transfer_mass, 5),
+                round(self.mixer_duration),
+                round(self.mixer_speed),
+                int(self.transfer_volume),
+                tuple(
+                    sorted(
+                        (powder, round(mass, 5))
+                        for powder, mass in self.powder_dispenses.items()
+                    )
+                ),
+            )
+        return self._signature
+
+    def _get_scaled_powders(self) -> Dict[str, float]:
+        """The masses of powders (g) to dispense for all replicates of this InputFile. This is built once and reused until `replicates` changes."""
+        if self._scaled_powders is None:
+            replicates = self.replicates
+            self._scaled_powders = {
+                powder: mass * replicates
+                for powder, mass in self.powder_dispenses.items()
+            }
+        return self._scaled_powders
+
+    def _get_labman_base(self) -> dict:
+        """The serialized fields shared by `to_json` and `to_labman_json`. This is built once and reused until `replicates` changes."""
+        if self._labman_base is None:
+            self._labman_base = {
+                "CrucibleReplicates": self.replicates,
+                "HeatingDuration": int(self.heating_duration),
+                "EthanolDispenseVolume": int(self.ethanol_volume)
+                * self.replicates,  # total volume of ethanol to dispense for all replicates
+                "MinimumTransferMass": round(self.min_transfer_mass, 5),
+                "MixerDuration": round(self.mixer_duration),
+                "MixerSpeed": round(self.mixer_speed),
+                "PowderDispenses": [
+                    {
+                        "PowderName": powder,
+                        "TargetMass": round(mass, 5),
+                    }
+                    for powder, mass in self._get_scaled_powders().items()
+                ],
+                "TargetTransferVolume": int(self.transfer_volume),
+            }
+        return self._labman_base
+
     def to_json(self):
+        # NOTE: the nested "PowderDispenses" list is shared with the cached base, do not modify it in place!
         return {
-            "CrucibleReplicates": self.replicates,
-            "HeatingDuration": int(self.heating_duration),
-            "EthanolDispenseVolume": int(self.ethanol_volume)
-            * self.replicates,  # total volume of ethanol to dispense for all replicates
-            "MinimumTransferMass": round(self.min_transfer_mass, 5),
-            "MixerDuration": round(self.mixer_duration),
-            "MixerSpeed": round(self.mixer_speed),
-            "PowderDispenses": [
-                {"PowderName": powder, "TargetMass": round(mass * self.replicates, 5)}
-                for powder, mass in self.powder_dispenses.items()
-            ],
-            "TargetTransferVolume": int(self.transfer_volume),
-            "time_added": self.time_added.isoformat(),
+            **self._get_labman_base(),
+            "time_added": self._time_added_iso,
         }
 
     def to_labman_json(self, position: int):
@@ -142,10 +275,16 @@ class InputFile:
             "TargetTransferVolume": 10000
             },
         """
-        j = self.to_json()
-        j.pop("time_added")
-        j["Position"] = position
-        return j
+        return {**self._get_labman_base(), "Position": position}
+
+    def _write_labman_json(self, buf: bytearray, position: int):
+        """Append the JSON encoding of `to_labman_json(position)` to `buf`. The encoded fields are cached alongside the serialized base, so only the position is encoded per call."""
+        if self._labman_json_prefix is None:
+            self._labman_json_prefix = _dumps(self._get_labman_base())[:-1]
+        buf += self._labman_json_prefix
+        buf += b',"Position":'
+        buf += _dumps(position)
+        buf += b"}"
 
     @classmethod
     def from_json(cls, json: Dict):
@@ -172,16 +311,22 @@ class InputFile:
         Returns:
             int: age (seconds)
         """
-        return (datetime.now() - self.time_added).seconds
+        return int(time.time() - self._time_added_epoch)
 
     @property
     def max_replicates(self) -> int:
-        """The maximum number of replicates this InputFile can support.
+        """The maximum number of replicates this InputFile can support. This is cached until `ethanol_volume` changes.
 
         Returns:
             int: maximum number of replicates
         """
-        return math.floor(self.MAX_JAR_VOLUME_UL / self.ethanol_volume)
+        if self._max_replicates is None:
+            self._max_replicates = (
+                int(self.MAX_JAR_VOLUME_UL // self.ethanol_volume)
+                if self.ethanol_volume > 0
+                else sys.maxsize
+            )
+        return self._max_replicates
 
     @property
     def can_accept_another_replicate(self) -> bool:
@@ -191,10 +336,7 @@ class InputFile:
             bool: True if this InputFile can accept another replicate, False otherwise.
         """
         # return False  # TODO uncomment when we are ready to support replicates
-        if not self.allow_replicates:
-            return False
-        else:
-            return self.replicates < self.max_replicates
+        return self.allow_replicates and self._replicates < self.max_replicates
 
     def __repr__(self):
         val = "<InputFile:"
@@ -206,22 +348,11 @@ class InputFile:
     def __eq__(self, other):
         if not isinstance(other, InputFile):
             return False
-        this = self.to_json()
-        that = other.to_json()
-        dont_consider_for_equality = ["CrucibleReplicates", "time_added"]
-
-        for each in [this, that]:
-            each["EthanolDispenseVolume"] /= each["CrucibleReplicates"]
-            for powder in each["PowderDispenses"]:
-                powder["TargetMass"] /= each["CrucibleReplicates"]
-            each.pop("CrucibleReplicates", None)
-            each.pop("time_added", None)
+        # compare per-replicate quantities, ignoring the number of replicates and the time added
+        return self._get_signature() == other._get_signature()
 
-        for key in dont_consider_for_equality:
-            this.pop(key, None)
-            that.pop(key, None)
-
-        return this == that
+    def __hash__(self):
+        return hash(self._get_signature())
 
 
 class SampleTrackingError(Exception):
@@ -230,18 +361,33 @@ class SampleTrackingError(Exception):
 
 class Workflow:
     MAX_CRUCIBLES: int = 16
-    INVALID_CHARACTERS: List[str] = [":", "\t", "\n", "\r", "\0", "\x0b"]
+    INVALID_CHARACTERS: FrozenSet[str] = frozenset(
+        [":", "\t", "\n", "\r", "\0", "\x0b"]
+    )
 
     def __init__(self, name: str):
-        if any([c in self.INVALID_CHARACTERS for c in name]):
+        if not self.INVALID_CHARACTERS.isdisjoint(name):
             raise ValueError(
                 f"Invalid character in name: {name}. The name must contain characters valid in a Windows filepath."
             )
         self.name = name
-        self.__inputs = []
-        self.__inputfile_to_sample_map: Dict[
-            int, List[Any]
-        ] = {}  # maps index of inputfile to list of associated samples.
+        # the inputfiles and, at the same index, the samples within each inputfile
+        self.__inputfiles: List[InputFile] = []
+        self.__sample_lists: List[List[Any]] = []
+        # (replicates, ethanol volume, powder dispenses) of each inputfile, as counted in the running totals below. Compared with the inputfiles to catch changes made to them after they were added.
+        self.__accounted: List[Tuple[int, float, Dict[str, float]]] = []
+        # (-heating duration, index) of each inputfile, kept sorted as inputfiles are added. This is the order in which they are executed; ties keep the order they were added in.
+        self._execution_order: List[Tuple[float, int]] = []
+        self._signature_to_index: Dict[
+            tuple, int
+        ] = {}  # maps the signature of a mergeable inputfile to the index of the latest inputfile with that signature. Earlier ones are already full.
+
+        # running totals over all inputfiles, updated in `add_input` (see `_sync_totals` for changes made to stored inputfiles)
+        self._required_crucibles = 0
+        self._required_ethanol_volume_ul = 0
+        self._required_powders: Dict[str, float] = defaultdict(int)
+        self._samples_tracked = False
+        self._tracked_replicates_changed = False
 
     def add_input(self, inputfile: InputFile, sample: Any = None):
         """Add an InputFile to this Workflow.
@@ -257,11 +403,63 @@ class Workflow:
 
             2. Rebuild this workflow without sample tracking (by passing `sample=None` (default) to `Workflow.add_input` for all inputs). This results in a valid workflow for the Labman, but WILL BREAK ALABOS WORKFLOW TRACKING. This is not recommended unless you are sure that you will not be using ALabOS to manage your workflow.
         """
-        if (self.required_crucibles + inputfile.replicates) > self.MAX_CRUCIBLES:
+        self._check_capacity(inputfile.replicates)
+        self._check_sample_tracking(
+            inputfile,
+            sample,
+            workflow_is_empty=self.required_crucibles == 0,
+            tracking_samples=self.samples_are_being_tracked,
+        )
+        self._merge_input(inputfile, sample)
+
+    def add_inputs(
+        self, inputfiles: Iterable[InputFile], samples: Optional[Iterable[Any]] = None
+    ):
+        """Add several InputFiles to this Workflow at once. The whole batch is checked before anything is added, so either all or none of the InputFiles are added.
+
+        Args:
+            inputfiles (Iterable[InputFile]): InputFiles to add. See `add_input`.
+            samples (Iterable[Any], optional): One sample identifier per InputFile. See `add_input`. Defaults to None, in which case samples are not tracked.
+
+        Raises:
+            ValueError: The number of samples does not match the number of InputFiles.
+            WorkflowFullError: The workflow cannot accomodate all of these InputFiles.
+            SampleTrackingError: Sample tracking would be violated by one of these InputFiles. See `add_input`.
+        """
+        inputfiles = list(inputfiles)
+        samples = [None] * len(inputfiles) if samples is None else list(samples)
+        if len(samples) != len(inputfiles):
+            raise ValueError(
+                f"Got {len(samples)} samples for {len(inputfiles)} inputfiles! Provide one sample per inputfile."
+            )
+
+        self._check_capacity(sum(inputfile.replicates for inputfile in inputfiles))
+        workflow_is_empty = self.required_crucibles == 0
+        tracking_samples = self.samples_are_being_tracked
+        for inputfile, sample in zip(inputfiles, samples):
+            self._check_sample_tracking(
+                inputfile, sample, workflow_is_empty, tracking_samples
+            )
+            if inputfile.replicates > 0:
+                workflow_is_empty = False
+                tracking_samples = tracking_samples or sample is not None
+
+        for inputfile, sample in zip(inputfiles, samples):
+            self._merge_input(inputfile, sample)
+
+    def _check_capacity(self, num_crucibles: int):
+        if (self.required_crucibles + num_crucibles) > self.MAX_CRUCIBLES:
             raise WorkflowFullError(
-                f"This workflow is too full ({self.required_crucibles}/{self.MAX_CRUCIBLES} crucibles) to accomomdate this input ({inputfile.replicates} crucibles)!"
+                f"This workflow is too full ({self.required_crucibles}/{self.MAX_CRUCIBLES} crucibles) to accomomdate this input ({num_crucibles} crucibles)!"
             )
 
+    def _check_sample_tracking(
+        self,
+        inputfile: InputFile,
+        sample: Any,
+        workflow_is_empty: bool,
+        tracking_samples: bool,
+    ):
         ## Ensure that adding this inputfile will not violate our sample tracking routine.
         tracking_this_sample = sample is not None
         sampletracking_broken = False
@@ -269,14 +467,14 @@ class Workflow:
             if inputfile.replicates > 1:
                 sampletracking_broken = True
                 initial_message = "Cannot add inputfiles with >1 replicates because we are tracking the samples attached to each inputfile!"
-            if not self.samples_are_being_tracked:
+            if not tracking_samples:
                 sampletracking_broken = True
                 initial_message = "Cannot track the sample for this inputfile because we have already added inputfiles to this workflow without sample tracking! Please rebuild this workflow without sample tracking."
-        elif not tracking_this_sample and self.samples_are_being_tracked:
+        elif not tracking_this_sample and tracking_samples:
             sampletracking_broken = True
             initial_message = "Cannot add this inputfile without sample tracking, because we have already added inputfiles to this workflow with sample tracking! Please add this inputfile with sample tracking (by passing `sample=...` to `Workflow.add_input`), or rebuild this workflow without sample tracking.)"
 
-        if self.required_crucibles == 0:
+        if workflow_is_empty:
             sampletracking_broken = False  # we havent added any inputfiles yet, so we can do whatever for this inputfile.
         if sampletracking_broken:
             raise SampleTrackingError(
@@ -290,30 +488,100 @@ class Workflow:
 """
             )
 
+    def _merge_input(self, inputfile: InputFile, sample: Any):
         ## Sample tracking was not violated. Now we either merge the inputfile into an existing one as replicate(s), or we add it as a new inputfile. We will fill existing inputfiles first. This inputfile may partially fill a matching existing inputfile. For example, if our inputfile has 4 replicates, but the existing match has room for 2 more replicates, we would fill the existing inputfile with 2 replicates and append the rest of this new inputfile with 2 replicates. Note that sample tracking only works when adding inputfiles with 1 replicate, so this partial filling does not violate sample tracking.
 
-        inputfile_index = None
+        num_crucibles = inputfile.replicates
+        if num_crucibles <= 0:
+            return  # nothing to add, and an empty inputfile must not show up in the totals
+        self._required_crucibles += num_crucibles
+        self._required_ethanol_volume_ul += inputfile.ethanol_volume * num_crucibles
+        required_powders = self._required_powders
+        for powder, mass in inputfile._get_scaled_powders().items():
+            required_powders[powder] += mass
+
         if inputfile.allow_replicates:
-            # try to merge this inputfile with an existing one
-            for idx, (existing_inputfile, sample_list) in enumerate(self.__inputs):
-                if inputfile != existing_inputfile:
-                    # not a matching inputfile
-                    continue
-                while (
-                    existing_inputfile.can_accept_another_replicate
-                    and inputfile.replicates > 0
-                ):
-                    existing_inputfile.replicates += 1
-                    sample_list.append(sample)
-                    inputfile.replicates -= 1
-                    inputfile_index = idx
-                if inputfile.replicates == 0:
-                    break
+            # try to merge this inputfile with an existing one. Only the latest matching inputfile can have room left, as a new one is only added once the previous match is full.
+            signature = inputfile._get_signature()
+            idx = self._signature_to_index.get(signature)
+            if idx is not None:
+                existing_inputfile = self.__inputfiles[idx]
+                if existing_inputfile._get_signature() != signature:
+                    # the recipe of the indexed inputfile was changed after it was added, it is no longer a match
+                    idx = None
+            if idx is not None:
+                # move as many replicates as fit in one step, rather than one at a time
+                num_merged = min(
+                    inputfile.replicates,
+                    existing_inputfile.max_replicates - existing_inputfile.replicates,
+                )
+                if num_merged > 0:
+                    existing_inputfile.replicates += num_merged
+                    self.__sample_lists[idx].extend([sample] * num_merged)
+                    self.__accounted[idx] = self._get_accounted(existing_inputfile)
+                    inputfile.replicates -= num_merged
 
         if (
             inputfile.replicates > 0
         ):  # we couldn't fully merge the inputfile with an existing one(s), or replicates were not enabled for this inputfile.
-            self.__inputs.append([inputfile, [sample]])
+            if inputfile.allow_replicates:
+                self._signature_to_index[signature] = len(self.__inputfiles)
+            bisect.insort(
+                self._execution_order,
+                (-inputfile.heating_duration, len(self.__inputfiles)),
+            )
+            self.__inputfiles.append(inputfile)
+            self.__sample_lists.append([sample])
+            self.__accounted.append(self._get_accounted(inputfile))
+        if sample is not None:
+            self._samples_tracked = True
+
+    @staticmethod
+    def _get_accounted(inputfile: InputFile) -> Tuple[int, float, Dict[str, float]]:
+        return inputfile.replicates, inputfile.ethanol_volume, inputfile.powder_dispenses
+
+    def _sync_totals(self):
+        """Bring the running totals up to date with the stored inputfiles. They are only recomputed if an inputfile's replicates, ethanol volume or (reassigned) powder dispenses changed since it was counted, which costs one comparison per inputfile otherwise."""
+        inputfiles = self.__inputfiles
+        accounted = self.__accounted
+        changed = False
+        for idx, inputfile in enumerate(inputfiles):
+            replicates, ethanol_volume, powder_dispenses = accounted[idx]
+            if (
+                inputfile.replicates == replicates
+                and inputfile.ethanol_volume == ethanol_volume
+                and inputfile.powder_dispenses is powder_dispenses
+            ):
+                continue
+            changed = True
+            if inputfile.replicates != replicates and self._samples_tracked:
+                self._tracked_replicates_changed = True
+            accounted[idx] = self._get_accounted(inputfile)
+        if not changed:
+            return
+
+        self._required_crucibles = sum(inputfile.replicates for inputfile in inputfiles)
+        self._required_ethanol_volume_ul = sum(
+            inputfile.ethanol_volume * inputfile.replicates for inputfile in inputfiles
+        )
+        required_powders = defaultdict(int)
+        for inputfile in inputfiles:
+            if inputfile.replicates > 0:
+                for powder, mass in inputfile._get_scaled_powders().items():
+                    required_powders[powder] += mass
+        self._required_powders = required_powders
+
+    def _validate(self):
+        """Check the workflow as a whole before it is serialized. Each `add_input` call already checks the InputFile being added, but the stored InputFiles can still be modified afterwards (e.g. by setting `replicates`), so the invariants are re-checked against their current state."""
+        self._sync_totals()
+        if self._required_crucibles > self.MAX_CRUCIBLES:
+            raise WorkflowFullError(
+                f"This workflow requires {self._required_crucibles} crucibles, but can hold at most {self.MAX_CRUCIBLES}!"
+            )
+        if self._tracked_replicates_changed:
+            raise SampleTrackingError(
+                "The replicates of an inputfile were changed after it was added to this workflow, which breaks sample tracking! Rebuild the workflow instead."
+            )
 
     def to_json(
         self,
@@ -325,50 +593,88 @@ class Workflow:
             raise ValueError(
                 "Cannot return sample tracking information because we were not tracking samples for this workflow!"
             )
+        order = self._get_execution_order(available_positions)
+        inputfiles = self.__inputfiles
 
-        if len(available_positions) < self.required_jars:
-            raise ValueError(
-                f"Insufficient available mixing pots ({len(available_positions)}) to accomodate this workflow (requires 4 {self.required_jars})!"
-            )
         data = {
             "WorkflowName": self.name,
             "Quadrant": quadrant_index,
-            "InputFile": [],
+            "InputFile": [
+                inputfiles[idx].to_labman_json(position=position)
+                for idx, position in zip(order, available_positions)
+            ],
         }
 
-        # sort inputfiles from longest -> shortest heating duration (ethanol drying time), minimizing the overall workflow time as inputfiles are executed in this order.
-
-        sorted_inputs = sorted(
-            self.__inputs,
-            key=lambda x: x[0].heating_duration,
-            reverse=True,
-        )
-
-        sample_mapping = {}  # {mixingpot_position: [sample1, sample2, ...], ...}
-        for (inputfile, samples_within_inputfile), position in zip(
-            sorted_inputs, available_positions
-        ):
-            inputfile: InputFile
-            data["InputFile"].append(inputfile.to_labman_json(position=position))
-            sample_mapping[position] = samples_within_inputfile
-
         if return_sample_tracking:
+            sample_lists = self.__sample_lists
+            sample_mapping = {
+                position: sample_lists[idx]
+                for idx, position in zip(order, available_positions)
+            }  # {mixingpot_position: [sample1, sample2, ...], ...}
             return data, sample_mapping
         else:
             return data
 
+    def to_json_bytes(
+        self, quadrant_index: int, available_positions: List[int]
+    ) -> bytes:
+        """The Labman workflow payload (see `to_json`), already serialized to JSON. This is the preferred way to submit a workflow: pass the result straight to `LabmanAPI.submit_workflow`.
+
+        Args:
+            quadrant_index (int): index of the quadrant to run the workflow on
+            available_positions (List[int]): mixing pot positions that can be used by this workflow
+
+        Returns:
+            bytes: JSON-encoded workflow
+        """
+        order = self._get_execution_order(available_positions)
+        inputfiles = self.__inputfiles
+
+        # written straight into one buffer, without building the intermediate dicts of `to_json`
+        buf = bytearray(b'{"WorkflowName":')
+        buf += _dumps(self.name)
+        buf += b',"Quadrant":'
+        buf += _dumps(quadrant_index)
+        buf += b',"InputFile":['
+        for i, (idx, position) in enumerate(zip(order, available_positions)):
+            if i > 0:
+                buf += b","
+            inputfiles[idx]._write_labman_json(buf, position)
+        buf += b"]}"
+        return bytes(buf)
+
+    def _get_execution_order(self, available_positions: List[int]) -> List[int]:
+        """Check that this workflow can be serialized onto `available_positions`, and return the indices of the inputfiles in the order they should be executed."""
+        self._validate()
+        if len(available_positions) < self.required_jars:
+            raise ValueError(
+                f"Insufficient available mixing pots ({len(available_positions)}) to accomodate this workflow (requires 4 {self.required_jars})!"
+            )
+        # inputfiles run from longest -> shortest heating duration (ethanol drying time), minimizing the overall workflow time. This order is maintained as inputfiles are added.
+        inputfiles = self.__inputfiles
+        if any(
+            key != -inputfiles[idx].heating_duration
+            for key, idx in self._execution_order
+        ):
+            # a heating duration was changed after its inputfile was added
+            self._execution_order = sorted(
+                (-inputfile.heating_duration, idx)
+                for idx, inputfile in enumerate(inputfiles)
+            )
+        return [idx for _, idx in self._execution_order]
+
     def __len__(self):
-        return len(self.inputfiles)
+        return len(self.__inputfiles)
 
     def __repr__(self):
-        return f"""<Workflow: {self.required_jars} jars, {self.required_crucibles} crucibles, {len(self.required_powders)} unique powders>"""
+        self._sync_totals()
+        return f"""<Workflow: {self.required_jars} jars, {self._required_crucibles} crucibles, {len(self._required_powders)} unique powders>"""
 
     @property
     def required_ethanol_volume_ul(self) -> int:
         """The total volume of ethanol (in microliters) required to execute this workflow"""
-        return sum(
-            [input.ethanol_volume * input.replicates for input in self.inputfiles]
-        )
+        self._sync_totals()
+        return self._required_ethanol_volume_ul
 
     @property
     def required_jars(self) -> int:
@@ -377,7 +683,7 @@ class Workflow:
         Returns:
             int: number of jars
         """
-        return len(self.inputfiles)
+        return len(self.__inputfiles)
 
     @property
     def required_crucibles(self) -> int:
@@ -386,7 +692,8 @@ class Workflow:
         Returns:
             int: number of crucibles
         """
-        return sum([input.replicates for input in self.inputfiles])
+        self._sync_totals()
+        return self._required_crucibles
 
     @property
     def required_powders(self) -> Dict[str, float]:
@@ -395,13 +702,8 @@ class Workflow:
         Returns:
             Dict[str, float]: dictionary of powders and their required masses (in grams)
         """
-        powders = {}
-        for input in self.inputfiles:
-            for powder, mass in input.powder_dispenses.items():
-                if powder not in powders:
-                    powders[powder] = 0
-                powders[powder] += mass * input.replicates
-        return powders
+        self._sync_totals()
+        return dict(self._required_powders)
 
     @property
     def inputfiles(self) -> List[InputFile]:
@@ -410,11 +712,9 @@ class Workflow:
         Returns:
             List[InputFile]: list of inputs
         """
-        return [inputfile for (inputfile, sample_list) in self.__inputs]
+        return list(self.__inputfiles)
 
     @property
     def samples_are_being_tracked(self) -> bool:
-        for inputfile, sample_list in self.__inputs:
-            if any([sample is not None for sample in sample_list]):
-                return True  # we are tracking samples for at least one inputfile
-        return False
+        # samples are only ever added, so this is set once the first tracked sample is merged in
+        return self._samples_tracked
@@ -2,7 +2,6 @@ from contextlib import contextmanager
 import datetime
 from enum import Enum, auto
 import uuid
-import requests
 from threading import Thread
 import time
 from typing import Dict, List, Union
@@ -44,7 +44,7 @@ class BatchOptimizer:
         self.requested_crucibles = []
         self.requested_jars = []
         for i, inp in enumerate(inputfiles):
-            if any([p not in self.powders for p in inp.powder_dispenses.keys()]):
+            if any(p not in self.powders for p in inp.powder_dispenses):
                 continue  # this powder is not available in Labman rn
             self.inputfiles.append(inp)
             self.inputfile_indices.append(i)
@@ -28,6 +28,9 @@ setup(
     description='Drivers for alab devices',
     zip_safe=False,
     install_requires=requirements,
-    extras_require={"ceder": requirements_ceder},
+    extras_require={
+        "ceder": requirements_ceder,
+        "async": ["aiohttp>=3.7"],  # for the asyncio drivers (e.g. AsyncBallDispenser)
+    },
     include_package_data=True
 )
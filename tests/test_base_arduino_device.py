@@ -0,0 +1,217 @@
+import json
+import threading
+import unittest
+from unittest import mock
+from urllib.parse import urlparse
+
+import requests
+
+from alab_control.ball_dispenser import BallDispenser, BallDispenserState, EmptyError
+
+
+class FakeFirmware:
+    """Stands in for ``requests.request``, answering like the Arduino firmware of a ball dispenser"""
+
+    def __init__(self, state: str = "stopped", polls_until_stopped: int = None, long_poll: bool = False,
+                 long_poll_failures: int = 0):
+        self.state = state
+        self.polls_until_stopped = polls_until_stopped  # number of /state polls answered with "running" after /start
+        self.long_poll = long_poll  # whether /wait_done is supported
+        self.long_poll_failures = long_poll_failures  # number of /wait_done requests that fail to connect
+        self.paths = []
+
+    def __call__(self, method, url, data=None, timeout=None):
+        path = urlparse(url).path
+        self.paths.append(path)
+        if path == "/start":
+            self.state = "running"
+            self._polls_left = self.polls_until_stopped
+        elif path == "/stop":
+            self.state = "stopped"
+        elif path == "/state":
+            if self.state == "running" and self.polls_until_stopped is not None:
+                if self._polls_left <= 0:
+                    self.state = "stopped"
+                self._polls_left -= 1
+        elif path == "/wait_done" and self.long_poll:
+            if self.long_poll_failures > 0:
+                self.long_poll_failures -= 1
+                raise requests.exceptions.ConnectionError("connection reset")
+            self.state = "stopped"
+        else:
+            return self.response(404, {})
+        return self.response(200, {"state": self.state})
+
+    @staticmethod
+    def response(status_code: int, body: dict) -> requests.Response:
+        response = requests.Response()
+        response.status_code = status_code
+        response._content = json.dumps(body).encode()
+        return response
+
+
+def patch_requests(firmware):
+    return mock.patch("alab_control._base_arduino_device.requests.request", side_effect=firmware)
+
+
+class TestSendRequest(unittest.TestCase):
+    def setUp(self):
+        self.sleep = mock.patch("alab_control._base_arduino_device.time.sleep").start()
+        self.uniform = mock.patch("alab_control._base_arduino_device.random.uniform", return_value=0.2).start()
+        self.addCleanup(mock.patch.stopall)
+
+    def test_retries_with_capped_backoff(self):
+        dispenser = BallDispenser("127.0.0.1")
+        failing = mock.Mock(side_effect=requests.exceptions.ConnectionError("connection refused"))
+        with patch_requests(failing), self.assertRaises(RuntimeError):
+            dispenser.send_request("/state", max_retries=5, backoff_base=0.1, backoff_cap=0.5)
+        self.assertEqual(failing.call_count, 5)
+        self.assertEqual(
+            self.uniform.call_args_list,
+            [mock.call(0.05, 0.2), mock.call(0.05, 0.4), mock.call(0.05, 0.5), mock.call(0.05, 0.5)],
+        )
+        self.assertEqual(self.sleep.call_args_list[1:], [mock.call(0.2)] * 4)  # the first sleep is the usual 0.1 s
+
+    def test_succeeds_after_a_failure(self):
+        flaky = mock.Mock(side_effect=[
+            requests.exceptions.ConnectionError("connection reset"),
+            FakeFirmware.response(200, {"state": "stopped"}),
+        ])
+        dispenser = BallDispenser("127.0.0.1")
+        with patch_requests(flaky):
+            self.assertEqual(dispenser.send_request("/state", max_retries=3), {"state": "stopped"})
+        self.assertEqual(flaky.call_count, 2)
+
+
+class TestCachedState(unittest.TestCase):
+    def test_state_is_cached_for_ttl(self):
+        firmware = FakeFirmware()
+        dispenser = BallDispenser("127.0.0.1")
+        with patch_requests(firmware), mock.patch("alab_control._base_arduino_device.time.monotonic") as monotonic:
+            monotonic.return_value = 100.0
+            self.assertEqual(dispenser.get_state(), BallDispenserState.STOPPED)
+            monotonic.return_value = 100.05
+            self.assertEqual(dispenser.get_state(), BallDispenserState.STOPPED)
+            self.assertEqual(firmware.paths, ["/state"])
+
+            monotonic.return_value = 100.2  # expired
+            dispenser.get_state()
+            self.assertEqual(firmware.paths, ["/state", "/state"])
+
+    def test_commands_invalidate_the_cache(self):
+        firmware = FakeFirmware()
+        dispenser = BallDispenser("127.0.0.1")
+        with patch_requests(firmware):
+            self.assertEqual(dispenser.get_state(), BallDispenserState.STOPPED)
+            firmware.state = "running"
+            self.assertEqual(dispenser.get_state(), BallDispenserState.STOPPED)  # still cached
+            dispenser.invalidate_state_cache()
+            self.assertEqual(dispenser.get_state(), BallDispenserState.RUNNING)
+            dispenser.stop()
+            self.assertEqual(dispenser.get_state(), BallDispenserState.STOPPED)
+        self.assertEqual(firmware.paths, ["/state", "/state", "/stop", "/state"])
+
+    def test_concurrent_callers_share_one_request(self):
+        firmware = FakeFirmware()
+        in_flight = threading.Event()
+        release = threading.Event()
+
+        def slow_firmware(*args, **kwargs):
+            in_flight.set()
+            release.wait(timeout=5)
+            return firmware(*args, **kwargs)
+
+        dispenser = BallDispenser("127.0.0.1")
+        results = []
+        with patch_requests(slow_firmware):
+            threads = [threading.Thread(target=lambda: results.append(dispenser.get_state())) for _ in range(4)]
+            for thread in threads:
+                thread.start()
+            in_flight.wait(timeout=5)
+            release.set()
+            for thread in threads:
+                thread.join(timeout=5)
+        self.assertEqual(results, [BallDispenserState.STOPPED] * 4)
+        self.assertEqual(firmware.paths, ["/state"])
+
+    def test_subscriber_can_call_back_into_the_device(self):
+        firmware = FakeFirmware(state="running")
+        dispenser = BallDispenser("127.0.0.1")
+
+        def stop_when_running(state):
+            if state == BallDispenserState.RUNNING:
+                dispenser.stop()
+
+        dispenser.state_emitter.subscribe(stop_when_running)
+        with patch_requests(firmware):
+            thread = threading.Thread(target=dispenser.get_state, daemon=True)
+            thread.start()
+            thread.join(timeout=5)
+        self.assertFalse(thread.is_alive(), "get_state deadlocked")
+        self.assertEqual(firmware.paths, ["/state", "/stop"])
+
+
+class TestBallDispenser(unittest.TestCase):
+    def test_timeout_reports_stopped(self):
+        class ShortTimeoutDispenser(BallDispenser):
+            EMPTY_TIMEOUT = 0.5
+
+        firmware = FakeFirmware()  # keeps running until it is told to stop
+        dispenser = ShortTimeoutDispenser("127.0.0.1")
+        events = []
+        dispenser.state_emitter.subscribe(events.append)
+        with patch_requests(firmware), self.assertRaises(EmptyError):
+            dispenser.dispense_balls()
+        self.assertEqual(firmware.paths[-1], "/stop")
+        self.assertEqual(events[-1], BallDispenserState.STOPPED)
+
+
+class TestWaitForState(unittest.TestCase):
+    def setUp(self):
+        patcher = mock.patch("alab_control._base_arduino_device.random.uniform", return_value=0)  # no backoff sleeps
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def started_dispenser(self, firmware: FakeFirmware) -> BallDispenser:
+        dispenser = BallDispenser("127.0.0.1")
+        with patch_requests(firmware):
+            dispenser.send_request("/start")
+        return dispenser
+
+    def test_long_poll(self):
+        firmware = FakeFirmware(long_poll=True)
+        dispenser = self.started_dispenser(firmware)
+        with patch_requests(firmware):
+            self.assertTrue(dispenser.wait_for_state(BallDispenserState.STOPPED, timeout=5))
+        self.assertEqual(firmware.paths, ["/start", "/wait_done"])
+
+    def test_falls_back_to_polling_without_long_poll(self):
+        firmware = FakeFirmware(polls_until_stopped=2)
+        dispenser = self.started_dispenser(firmware)
+        with patch_requests(firmware):
+            self.assertTrue(dispenser.wait_for_state(BallDispenserState.STOPPED, timeout=5))
+            self.assertFalse(dispenser._long_poll_supported)
+            firmware.paths.clear()
+            dispenser.send_request("/start")
+            self.assertTrue(dispenser.wait_for_state(BallDispenserState.STOPPED, timeout=5))
+        self.assertNotIn("/wait_done", firmware.paths)  # not asked again
+
+    def test_retries_failed_long_poll(self):
+        firmware = FakeFirmware(long_poll=True, long_poll_failures=1)
+        dispenser = self.started_dispenser(firmware)
+        with patch_requests(firmware):
+            self.assertTrue(dispenser.wait_for_state(BallDispenserState.STOPPED, timeout=5))
+        self.assertEqual(firmware.paths, ["/start", "/wait_done", "/wait_done"])
+
+    def test_falls_back_to_polling_when_long_poll_keeps_failing(self):
+        firmware = FakeFirmware(polls_until_stopped=2, long_poll=True, long_poll_failures=100)
+        dispenser = self.started_dispenser(firmware)
+        with patch_requests(firmware):
+            self.assertTrue(dispenser.wait_for_state(BallDispenserState.STOPPED, timeout=5))
+        self.assertEqual(firmware.paths.count("/wait_done"), 5)
+        self.assertIn("/state", firmware.paths)
+        self.assertTrue(dispenser._long_poll_supported)  # a connection problem, the firmware may still support it
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,151 @@
+import gzip
+import json
+import threading
+import unittest
+from unittest import mock
+
+import numpy as np
+import orjson
+import requests
+
+from alab_control.labman.api import LabmanAPI, WorkflowValidationResult
+from alab_control.labman.error import LabmanCommunicationError
+
+
+def labman_response(data=None, status_code: int = 200) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status_code
+    response._content = json.dumps({"Status": "OK", "Data": data or {}}).encode()
+    return response
+
+
+class LabmanAPITestCase(unittest.TestCase):
+    def setUp(self):
+        self.api = LabmanAPI("127.0.0.1", 8080)
+        self.api._session.close()
+        self.api._session = mock.Mock()
+        self.api._session.get.return_value = labman_response()
+        self.api._session.post.return_value = labman_response()
+
+    def last_post(self) -> dict:
+        return self.api._session.post.call_args.kwargs
+
+
+class TestRequestBody(LabmanAPITestCase):
+    def test_json_body(self):
+        workflow = {"WorkflowName": "w", "Quadrant": 1, "InputFile": [{"TargetMass": 1.5}]}
+        self.api.submit_workflow(workflow)
+        kwargs = self.last_post()
+        self.assertEqual(kwargs["url"], "http://127.0.0.1:8080/PotsLoaded")
+        self.assertEqual(orjson.loads(kwargs["data"]), workflow)
+        self.assertEqual(kwargs["headers"], {"Content-Type": "application/json"})
+        self.assertEqual(kwargs["timeout"], 5)
+        self.assertNotIn("json", kwargs)
+
+    def test_encoded_body_is_sent_as_is(self):
+        body = orjson.dumps({"WorkflowName": "w"})
+        self.api.submit_workflow(body)
+        self.assertIs(self.last_post()["data"], body)
+
+    def test_float_subclasses(self):
+        class Grams(float):
+            pass
+
+        self.api.submit_workflow({"masses": [np.float64(1.5), np.float32(0.5), np.int64(2), Grams(0.25)]})
+        self.assertEqual(orjson.loads(self.last_post()["data"]), {"masses": [1.5, 0.5, 2, 0.25]})
+
+    def test_gzip(self):
+        self.api.GZIP_MIN_BYTES = 10
+        self.api.submit_workflow({"WorkflowName": "a long enough workflow name"})
+        kwargs = self.last_post()
+        self.assertEqual(kwargs["headers"]["Content-Encoding"], "gzip")
+        self.assertEqual(orjson.loads(gzip.decompress(kwargs["data"])), {"WorkflowName": "a long enough workflow name"})
+
+
+class TestPoolSubmit(LabmanAPITestCase):
+    def setUp(self):
+        super().setUp()
+        self.submitted = []
+        self.first_validated = threading.Event()
+        self.api._session.post.side_effect = self.fake_post
+
+    def fake_post(self, url, data, **kwargs):
+        payload = orjson.loads(data)
+        if url.endswith("/ValidateWorkflow"):
+            powder = payload[0]["PowderDispenses"][0]["PowderName"]
+            if powder == "slow":
+                self.first_validated.wait(timeout=5)  # finishes after the others
+            else:
+                self.first_validated.set()
+            result = "PowderNotLoaded" if powder == "missing" else "NoError"
+            return labman_response({"Result": result})
+        if payload["WorkflowName"] == "rejected":
+            return labman_response(status_code=500)
+        self.submitted.append(payload["WorkflowName"])
+        return labman_response()
+
+    @staticmethod
+    def workflow(name: str, powder: str) -> dict:
+        return {
+            "WorkflowName": name,
+            "Quadrant": 1,
+            "InputFile": [{"PowderDispenses": [{"PowderName": powder}]}],
+        }
+
+    def test_results_in_order_with_errors(self):
+        workflows = [
+            self.workflow("slow", "slow"),
+            orjson.dumps(self.workflow("bytes", "A")),
+            self.workflow("invalid", "missing"),
+            self.workflow("rejected", "A"),
+        ]
+        results = self.api.pool_submit(workflows)
+
+        self.assertEqual(
+            results[:3],
+            [
+                WorkflowValidationResult.NoError,
+                WorkflowValidationResult.NoError,
+                WorkflowValidationResult.PowderNotLoaded,
+            ],
+        )
+        self.assertIsInstance(results[3], LabmanCommunicationError)
+        self.assertEqual(sorted(self.submitted), ["bytes", "slow"])  # invalid workflows are not submitted
+
+
+class TestQueryParameters(LabmanAPITestCase):
+    def test_query_parameters(self):
+        self.api.get_results("a&b c")
+        kwargs = self.api._session.get.call_args.kwargs
+        self.assertEqual(kwargs["params"], {"workflowName": "a&b c"})
+        self.assertEqual(
+            requests.Request("GET", kwargs["url"], params=kwargs["params"])
+            .prepare()
+            .url,
+            "http://127.0.0.1:8080/GetResults?workflowName=a%26b+c",
+        )
+
+        for call, url, params in [
+            (
+                lambda: self.api.request_indexing_rack_control(2),
+                "/RequestIndexingRackControl",
+                {"outwardFacingQuadrant": 2},
+            ),
+            (lambda: self.api.pots_unloaded(3), "/PotsUnloaded", {"quadrant": 3}),
+            (lambda: self.api.unload_powder(12), "/DosingHeadUnloaded", {"position": 12}),
+        ]:
+            call()
+            kwargs = self.last_post()
+            self.assertEqual(kwargs["url"], "http://127.0.0.1:8080" + url)
+            self.assertEqual(kwargs["params"], params)
+            self.assertNotIn("data", kwargs)
+
+    def test_defaults_are_not_modified(self):
+        self.api.get_results("w")
+        self.api.get_status()
+        self.assertNotIn("params", self.api._session.get.call_args.kwargs)
+        self.assertEqual(LabmanAPI.REQUESTS_KWARGS, {"timeout": 5})
+
+
+if __name__ == "__main__":
+    unittest.main()
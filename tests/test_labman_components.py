@@ -0,0 +1,217 @@
+import unittest
+from datetime import datetime
+
+import numpy as np
+import orjson
+
+from alab_control.labman.components import InputFile, SampleTrackingError, Workflow
+from alab_control.labman.error import WorkflowFullError
+
+
+TIME_ADDED = datetime(2024, 1, 1)
+
+
+def make_inputfile(powder_dispenses=None, **kwargs) -> InputFile:
+    kwargs.setdefault("time_added", TIME_ADDED)
+    return InputFile(powder_dispenses or {"A": 1.0, "B": 0.5}, **kwargs)
+
+
+class TestInputFile(unittest.TestCase):
+    def test_equality_ignores_replicates_and_powder_order(self):
+        self.assertEqual(
+            make_inputfile({"A": 1.0, "B": 0.5}),
+            make_inputfile({"B": 0.5, "A": 1.0}, replicates=2),
+        )
+        self.assertEqual(
+            hash(make_inputfile({"A": 1.0, "B": 0.5})),
+            hash(make_inputfile({"B": 0.5, "A": 1.0})),
+        )
+        self.assertNotEqual(make_inputfile({"A": 1.0}), make_inputfile({"A": 1.1}))
+
+    def test_caches_follow_attribute_changes(self):
+        inputfile = make_inputfile({"A": 1.0})
+        inputfile.to_json()
+        self.assertEqual(inputfile.max_replicates, 2)
+
+        inputfile.heating_duration = 10
+        inputfile.ethanol_volume = 5000
+        self.assertEqual(inputfile.to_json()["HeatingDuration"], 10)
+        self.assertNotEqual(inputfile, make_inputfile({"A": 1.0}))
+        self.assertEqual(inputfile.max_replicates, 4)
+
+        inputfile.replicates = 3
+        self.assertEqual(
+            inputfile.to_labman_json(position=1)["PowderDispenses"],
+            [{"PowderName": "A", "TargetMass": 3.0}],
+        )
+
+    def test_json_roundtrip(self):
+        inputfile = make_inputfile()
+        self.assertEqual(InputFile.from_json(inputfile.to_json()).to_json(), inputfile.to_json())
+
+
+class TestWorkflow(unittest.TestCase):
+    def test_merge_fills_partial_match_first(self):
+        # 10 mL of ethanol per replicate -> at most 2 replicates per jar
+        workflow = Workflow("merge")
+        workflow.add_input(make_inputfile())
+        workflow.add_input(make_inputfile(replicates=2))  # 1 merged, 1 in a new jar
+        workflow.add_input(make_inputfile())  # fills the second jar
+        workflow.add_input(make_inputfile())  # third jar
+
+        self.assertEqual([f.replicates for f in workflow.inputfiles], [2, 2, 1])
+        self.assertEqual(workflow.required_jars, 3)
+        self.assertEqual(workflow.required_crucibles, 5)
+        self.assertEqual(workflow.required_ethanol_volume_ul, 50000)
+        self.assertEqual(workflow.required_powders, {"A": 5.0, "B": 2.5})
+
+    def test_no_merge_without_allow_replicates(self):
+        workflow = Workflow("no_replicates")
+        workflow.add_input(make_inputfile(allow_replicates=False))
+        workflow.add_input(make_inputfile())
+        workflow.add_input(make_inputfile(allow_replicates=False))
+        workflow.add_input(make_inputfile())
+
+        self.assertEqual([f.replicates for f in workflow.inputfiles], [1, 2, 1])
+        self.assertEqual(
+            [f.allow_replicates for f in workflow.inputfiles], [False, True, False]
+        )
+
+    def test_add_inputs_is_all_or_nothing(self):
+        workflow = Workflow("batch")
+        with self.assertRaises(SampleTrackingError):
+            workflow.add_inputs(
+                [make_inputfile(), make_inputfile(), make_inputfile()],
+                samples=["s1", "s2", None],
+            )
+        self.assertEqual(len(workflow), 0)
+        self.assertEqual(workflow.required_crucibles, 0)
+        self.assertFalse(workflow.samples_are_being_tracked)
+
+        workflow.add_inputs([make_inputfile(), make_inputfile()], samples=["s1", "s2"])
+        self.assertEqual(workflow.required_crucibles, 2)
+        self.assertTrue(workflow.samples_are_being_tracked)
+
+    def test_first_tracked_input_may_have_replicates(self):
+        # add_input lets the first tracked inputfile have several replicates, so serializing must accept it too
+        workflow = Workflow("first_tracked")
+        workflow.add_input(
+            make_inputfile({"A": 1.0}, ethanol_volume_ul=5000, replicates=3), sample="s0"
+        )
+        data, sample_mapping = workflow.to_json(
+            quadrant_index=1, available_positions=[1, 2], return_sample_tracking=True
+        )
+        self.assertEqual(data["InputFile"][0]["CrucibleReplicates"], 3)
+        self.assertEqual(sample_mapping, {1: ["s0"]})
+        workflow.to_json_bytes(quadrant_index=1, available_positions=[1, 2])
+
+    def test_validation_catches_later_changes(self):
+        workflow = Workflow("changed")
+        inputfile = make_inputfile()
+        workflow.add_input(inputfile, sample="s1")
+        workflow.add_input(make_inputfile(), sample="s2")  # merged into the first inputfile
+        workflow.to_json(quadrant_index=1, available_positions=[1])
+
+        inputfile.replicates = 1
+        with self.assertRaises(SampleTrackingError):
+            workflow.to_json(quadrant_index=1, available_positions=[1])
+
+    def test_zero_replicates_are_ignored(self):
+        workflow = Workflow("empty")
+        workflow.add_input(make_inputfile(replicates=0))
+        self.assertEqual(len(workflow), 0)
+        self.assertEqual(workflow.required_powders, {})
+
+    def test_totals_follow_changes_to_stored_inputfiles(self):
+        workflow = Workflow("totals")
+        inputfile = make_inputfile()
+        workflow.add_input(inputfile)
+        workflow.add_input(make_inputfile({"C": 2.0}))
+
+        inputfile.replicates = 10
+        self.assertEqual(workflow.required_crucibles, 11)
+        self.assertEqual(workflow.required_ethanol_volume_ul, 110000)
+        self.assertEqual(workflow.required_powders, {"A": 10.0, "B": 5.0, "C": 2.0})
+
+        inputfile.ethanol_volume = 1000
+        inputfile.powder_dispenses = {"A": 2.0}
+        self.assertEqual(workflow.required_ethanol_volume_ul, 20000)
+        self.assertEqual(workflow.required_powders, {"A": 20.0, "C": 2.0})
+
+        # new inputs are checked against the updated total
+        with self.assertRaises(WorkflowFullError):
+            workflow.add_input(make_inputfile({"D": 1.0}, replicates=6))
+
+    def test_to_json_bytes_accepts_numpy_values(self):
+        class Grams(float):
+            pass
+
+        workflow = Workflow("numpy")
+        workflow.add_input(
+            make_inputfile(
+                {"A": np.float64(1.25), "B": np.float32(0.5), "C": Grams(0.75)},
+                replicates=np.int64(2),
+            )
+        )
+        data = orjson.loads(
+            workflow.to_json_bytes(
+                quadrant_index=np.int64(1), available_positions=[np.int64(3)]
+            )
+        )
+        self.assertEqual(data["Quadrant"], 1)
+        self.assertEqual(data["InputFile"][0]["Position"], 3)
+        self.assertEqual(data["InputFile"][0]["CrucibleReplicates"], 2)
+        self.assertEqual(
+            data["InputFile"][0]["PowderDispenses"],
+            [
+                {"PowderName": "A", "TargetMass": 2.5},
+                {"PowderName": "B", "TargetMass": 1.0},
+                {"PowderName": "C", "TargetMass": 1.5},
+            ],
+        )
+
+    def test_execution_order(self):
+        workflow = Workflow("order")
+        workflow.add_input(make_inputfile({"A": 1.0}, heating_duration_s=100))
+        workflow.add_input(make_inputfile({"B": 1.0}, heating_duration_s=200))
+        workflow.add_input(make_inputfile({"C": 1.0}, heating_duration_s=100))
+        workflow.add_input(make_inputfile({"D": 1.0}, heating_duration_s=200))
+
+        data = workflow.to_json(quadrant_index=1, available_positions=[1, 2, 3, 4])
+        # longest heating first, equal heating durations keep the order they were added in
+        self.assertEqual(
+            [f["PowderDispenses"][0]["PowderName"] for f in data["InputFile"]],
+            ["B", "D", "A", "C"],
+        )
+        self.assertEqual([f["Position"] for f in data["InputFile"]], [1, 2, 3, 4])
+
+    def test_to_json_bytes_matches_to_json(self):
+        workflow = Workflow('name with "quotes" and ü')
+        workflow.add_input(make_inputfile(heating_duration_s=100))
+        workflow.add_input(make_inputfile({"C": 0.1234567}, ethanol_volume_ul=5000))
+        workflow.add_input(make_inputfile(replicates=2))
+        positions = [3, 5, 7, 9]
+
+        self.assertEqual(
+            workflow.to_json_bytes(quadrant_index=2, available_positions=positions),
+            orjson.dumps(
+                workflow.to_json(quadrant_index=2, available_positions=positions)
+            ),
+        )
+
+    def test_to_json_sample_tracking(self):
+        workflow = Workflow("tracking")
+        for sample in ["s1", "s2", "s3"]:
+            workflow.add_input(make_inputfile(), sample=sample)
+        _, sample_mapping = workflow.to_json(
+            quadrant_index=1, available_positions=[4, 5], return_sample_tracking=True
+        )
+        self.assertEqual(sample_mapping, {4: ["s1", "s2"], 5: ["s3"]})
+
+    def test_invalid_name(self):
+        with self.assertRaises(ValueError):
+            Workflow("bad:name")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import unittest
+from enum import Enum
+
+from alab_control._base_arduino_device import StateChangeEmitter
+
+
+class State(Enum):
+    STOPPED = "stopped"
+    RUNNING = "running"
+
+
+class TestStateChangeEmitter(unittest.TestCase):
+    def setUp(self):
+        self.events = []
+
+    def make_emitter(self, min_interval_s: float) -> StateChangeEmitter:
+        emitter = StateChangeEmitter(min_interval_s=min_interval_s)
+        emitter.subscribe(self.events.append)
+        return emitter
+
+    def test_only_changes_are_emitted(self):
+        emitter = self.make_emitter(min_interval_s=0)
+        for state in [State.STOPPED, State.STOPPED, State.RUNNING, State.RUNNING, State.STOPPED]:
+            emitter.observe(state)
+        self.assertEqual(self.events, [State.STOPPED, State.RUNNING, State.STOPPED])
+
+    def test_debounce_and_flush(self):
+        emitter = self.make_emitter(min_interval_s=60)
+        emitter.observe(State.STOPPED)
+        emitter.observe(State.RUNNING)  # within the interval, held back
+        self.assertEqual(self.events, [State.STOPPED])
+
+        emitter.flush()
+        self.assertEqual(self.events, [State.STOPPED, State.RUNNING])
+        self.assertEqual(emitter.last_emitted_state, State.RUNNING)
+
+        emitter.flush()  # nothing pending
+        self.assertEqual(self.events, [State.STOPPED, State.RUNNING])
+
+    def test_reverted_change_is_dropped(self):
+        emitter = self.make_emitter(min_interval_s=60)
+        emitter.observe(State.STOPPED)
+        emitter.observe(State.RUNNING)
+        emitter.observe(State.STOPPED)  # back to the emitted state before the interval passed
+        emitter.flush()
+        self.assertEqual(self.events, [State.STOPPED])
+
+    def test_unsubscribe(self):
+        emitter = self.make_emitter(min_interval_s=0)
+        emitter.unsubscribe(self.events.append)
+        emitter.observe(State.RUNNING)
+        self.assertEqual(self.events, [])
+
+
+if __name__ == "__main__":
+    unittest.main()